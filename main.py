@@ -1,10 +1,107 @@
+import io
 import os
+import re
 import sys
+import shutil
+import fnmatch
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import coloredlogs
 from tqdm import tqdm
 
 
+# Количество первых байт файла, проверяемых на наличие нулевого байта
+BINARY_PROBE_SIZE = 8192
+
+# Файлы больше этого размера копируются в вывод потоком, а не читаются целиком
+STREAM_THRESHOLD = 1024 * 1024
+
+# Размер блока при потоковом копировании содержимого файла
+COPY_CHUNK_SIZE = 64 * 1024
+
+# Размер буфера записи файла отчёта
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+# Расширения бинарных файлов в нижнем регистре, без ведущей точки
+BINARY_EXTENSIONS = frozenset({
+    "exe",  # Исполняемый файл Windows
+    "dll",  # Динамическая библиотека Windows
+    "bin",  # Обычный бинарный файл
+    "dat",  # Данные
+    "img",  # Образ диска
+    "iso",  # Образ оптического диска
+    "pdf",  # Портативный формат документа
+
+    "avi",  # Видеофайл в формате AVI
+    "mp4",  # Видеофайл в формате MP4
+    "mov",  # Видеофайл в формате MOV
+    "mkv",  # Видеофайл в формате MKV
+    "wmv",  # Видеофайл в формате WMV
+    "flv",  # Видеофайл в формате FLV
+    "mpeg",  # Видеофайл в формате MPEG
+    "mpg",  # Видеофайл в формате MPG
+    "m4v",  # Видеофайл в формате M4V
+    "3gp",  # Видеофайл в формате 3GP
+    "webm",  # Видеофайл в формате WebM
+    "ts",  # Видеофайл в формате TS
+    "mts",  # Видеофайл в формате MTS
+    "m2ts",  # Видеофайл в формате M2TS
+    "vob",  # Видеофайл в формате VOB
+    "ogg",  # Видеофайл в формате OGG
+    "ogv",  # Видеофайл в формате OGV
+    "divx",  # Видеофайл в формате DivX
+    "xvid",  # Видеофайл в формате Xvid
+
+    "mp3",  # Аудиофайл в формате MP3
+    "wav",  # Аудиофайл в формате WAV
+    "zip",  # Архив ZIP
+    "rar",  # Архив RAR
+    "tar",  # Архив TAR
+    "gz",  # Архив GZIP
+    "7z",  # Архив 7-Zip
+
+    "jpg",  # Изображение в формате JPEG
+    "jpeg",  # Изображение в формате JPEG
+    "jpe",  # Изображение в формате JPEG
+    "jif",  # Изображение в формате JPEG
+    "jfif",  # Изображение в формате JPEG
+    "jfi",  # Изображение в формате JPEG
+    "png",  # Изображение в формате PNG
+    "gif",  # Изображение в формате GIF
+    "bmp",  # Изображение в формате BMP
+    "dib",  # Изображение в формате BMP
+    "tif",  # Изображение в формате TIFF
+    "tiff",  # Изображение в формате TIFF
+    "webp",  # Изображение в формате WebP
+    "svg",  # Векторное изображение в формате SVG
+    "svgz",  # Векторное изображение в формате SVG (сжатый)
+    "ico",  # Иконка в формате ICO
+    "jxr",  # Изображение в формате JPEG XR
+    "wdp",  # Изображение в формате JPEG XR
+    "hdp",  # Изображение в формате JPEG XR
+    "jp2",  # Изображение в формате JPEG 2000
+    "j2k",  # Изображение в формате JPEG 2000
+    "jpf",  # Изображение в формате JPEG 2000
+    "jpx",  # Изображение в формате JPEG 2000
+    "jpm",  # Изображение в формате JPEG 2000
+    "mj2",  # Изображение в формате JPEG 2000
+
+    "otf",  # Открытый тип шрифта
+    "ttf",  # TrueType шрифт
+    "woff",  # Веб-шрифт формата WOFF (Web Open Font Format)
+    "woff2",  # Веб-шрифт формата WOFF 2.0 (Web Open Font Format 2.0)
+    "eot",  # Файл встраиваемого шрифта формата EOT (Embedded OpenType)
+    "pfa",  # Компактный файл шрифта формата PFA (PostScript Font ASCII)
+    "pfb",  # Компактный файл шрифта формата PFB (PostScript Font Binary)
+    "otc",  # Компактный файл шрифта формата OTC (OpenType Compact Font)
+    "ttc",  # Компактный файл шрифта формата TTC (TrueType Collection)
+    "dfont",  # Файл шрифта Macintosh формата Dfont
+
+    # Добавьте другие расширения, если необходимо
+})
+
+
 def get_readme_content(repo_path):
     """
     Получает содержимое файла README.md.
@@ -25,179 +122,278 @@ def get_readme_content(repo_path):
     return "README.md не найден."
 
 
-def traverse_repo_iteratively(repo_path, ignore_file):
+def normalize_ignore_entry(entry):
+    """
+    Приводит строку из файла игнорирования к виду относительных путей обхода.
+
+    Записи вида "node_modules/" или "./build" сопоставляются с путём папки,
+    поэтому игнорируемые поддеревья отсекаются до спуска в них.
+
+    Args:
+        entry (str): Строка из файла игнорирования.
+
+    Returns:
+        str: Относительный путь без "./" в начале и без закрывающего слэша.
+    """
+    entry = entry.strip().replace("/", os.sep)
+    if entry.startswith("." + os.sep):
+        entry = entry[2:]
+    return entry.rstrip(os.sep) or entry
+
+
+def scan_directory(path):
+    """
+    Перечисляет записи одной папки.
+
+    Тип записи берётся из данных, которые ОС возвращает пакетно вместе с именами
+    (d_type в readdir/getdents64 или FindNextFileW в Windows), поэтому отдельный
+    stat для каждой записи не выполняется. Символические ссылки на папки
+    не считаются папками и не раскрываются, поэтому циклов при обходе нет.
+    Обычным файлом считается только запись, указывающая на обычный файл:
+    FIFO, сокеты, ссылки на папки, битые и зацикленные ссылки не читаются
+    (stat выполняется только для символических ссылок).
+
+    Args:
+        path (str): Путь к папке.
+
+    Returns:
+        list: Список кортежей (имя, является_папкой, является_файлом).
+    """
+    entries = []
+    with os.scandir(path) as scanner:
+        for entry in scanner:
+            try:
+                is_file = entry.is_file()
+            except OSError:
+                # Зацикленная ссылка или ссылка в недоступную папку не должна прерывать обход
+                is_file = False
+            entries.append((entry.name, entry.is_dir(follow_symlinks=False), is_file))
+    return entries
+
+
+def load_ignored_paths(ignore_file):
+    """
+    Считывает файл игнорирования.
+
+    Каждая строка сравнивается с путём точно. Строки с символами "*", "?" или "["
+    дополнительно считаются шаблонами fnmatch (например, "*.log" или "build/*"),
+    поэтому пути вроде "pages/[id]" продолжают совпадать буквально. Все шаблоны
+    компилируются один раз в общее регулярное выражение.
+
+    Args:
+        ignore_file (str): Путь к файлу игнорирования.
+
+    Returns:
+        tuple: Кортеж (точные_пути, шаблон), где точные_пути — frozenset нормализованных
+        относительных путей, а шаблон — скомпилированное регулярное выражение или None.
+    """
+    exact_paths = set()
+    glob_patterns = []
+    with open(ignore_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = normalize_ignore_entry(line)
+            exact_paths.add(entry)
+            if any(char in entry for char in "*?["):
+                glob_patterns.append(fnmatch.translate(entry))
+
+    ignored_pattern = re.compile("|".join(glob_patterns)) if glob_patterns else None
+    return frozenset(exact_paths), ignored_pattern
+
+
+def traverse_repo_iteratively(repo_path, ignored_paths, ignored_pattern=None):
     """
     Итеративно обходит структуру репозитория, возвращая пути к файлам и папкам.
 
     Args:
         repo_path (str): Путь к папке репозитория.
-        ignore_file (str): Путь к файлу игнорирования.
+        ignored_paths (frozenset): Точные пути, полученные из load_ignored_paths.
+        ignored_pattern (re.Pattern): Шаблон игнорируемых путей из load_ignored_paths (по умолчанию: None).
 
     Yields:
-        str: Относительный путь к каждому найденному файлу или папке.
+        tuple: Кортеж (относительный_путь, является_файлом) для каждого найденного файла или папки,
+        где является_файлом истинно только для обычных файлов, которые можно прочитать.
     """
     dirs_to_visit = [(repo_path, "")]
-    dirs_visited = set()
-
-    with open(ignore_file, "r", encoding="utf-8") as f:
-        ignored_paths = [line.strip() for line in f.readlines() if line.strip()]
+    sep = os.sep
 
     while dirs_to_visit:
         current_path, relative_path = dirs_to_visit.pop()
-        dirs_visited.add(relative_path)
         try:
-            entries = os.listdir(current_path)
+            entries = scan_directory(current_path)
         except PermissionError:
             logging.warning("Ошибка доступа к директории: %s", current_path)
             continue
 
-        for entry in tqdm(entries, desc=f"Обработка {relative_path}", leave=False):
-            entry_path = os.path.join(current_path, entry)
-            entry_relative_path = os.path.join(relative_path, entry)
+        # Префикс вычисляется один раз на директорию вместо os.path.join для каждой записи
+        prefix = f"{relative_path}{sep}" if relative_path else ""
+        for name, is_dir, is_file in entries:
+            entry_relative_path = prefix + name
             if entry_relative_path in ignored_paths:
                 continue  # Пропустить игнорируемые файлы/папки
-            if os.path.isdir(entry_path):
-                if entry_relative_path not in dirs_visited:
-                    yield entry_relative_path  # Возвращаем путь к директории без закрывающего слэша
-                    dirs_to_visit.append((entry_path, entry_relative_path))
+            if ignored_pattern is not None and ignored_pattern.match(entry_relative_path):
+                continue
+            if is_dir:
+                yield entry_relative_path, False  # Возвращаем путь к директории без закрывающего слэша
+                dirs_to_visit.append((f"{current_path}{sep}{name}", entry_relative_path))
             else:
-                yield entry_relative_path  # Возвращаем путь к файлу
+                yield entry_relative_path, is_file  # Возвращаем путь к файлу или иной записи
 
 
-def get_file_contents_iteratively(repo_path, ignore_file):
+def iterate_file_paths(entries, repo_paths):
     """
-    Итеративно считывает содержимое файлов, пропуская бинарные файлы и игнорируемые пути.
+    Отбирает пути к файлам из результатов обхода, запоминая все пройденные пути.
 
     Args:
-        repo_path (str): Путь к папке репозитория.
-        ignore_file (str): Путь к файлу игнорирования.
+        entries (iterable): Кортежи (относительный_путь, является_файлом) из traverse_repo_iteratively.
+        repo_paths (list): Список, в который добавляются все пути к файлам и папкам.
 
     Yields:
-        tuple: Кортеж, содержащий (путь_к_файлу, содержимое_файла) для каждого небинарного файла.
+        str: Относительный путь к каждому найденному обычному файлу.
     """
-    binary_extensions = [
-        ".exe",  # Исполняемый файл Windows
-        ".dll",  # Динамическая библиотека Windows
-        ".bin",  # Обычный бинарный файл
-        ".dat",  # Данные
-        ".img",  # Образ диска
-        ".iso",  # Образ оптического диска
-        ".pdf",  # Портативный формат документа
-
-        ".avi",  # Видеофайл в формате AVI
-        ".mp4",  # Видеофайл в формате MP4
-        ".mov",  # Видеофайл в формате MOV
-        ".mkv",  # Видеофайл в формате MKV
-        ".wmv",  # Видеофайл в формате WMV
-        ".flv",  # Видеофайл в формате FLV
-        ".mpeg",  # Видеофайл в формате MPEG
-        ".mpg",  # Видеофайл в формате MPG
-        ".m4v",  # Видеофайл в формате M4V
-        ".3gp",  # Видеофайл в формате 3GP
-        ".webm",  # Видеофайл в формате WebM
-        ".ts",  # Видеофайл в формате TS
-        ".mts",  # Видеофайл в формате MTS
-        ".m2ts",  # Видеофайл в формате M2TS
-        ".vob",  # Видеофайл в формате VOB
-        ".ogg",  # Видеофайл в формате OGG
-        ".ogv",  # Видеофайл в формате OGV
-        ".divx",  # Видеофайл в формате DivX
-        ".xvid",  # Видеофайл в формате Xvid
-
-        ".mp3",  # Аудиофайл в формате MP3
-        ".wav",  # Аудиофайл в формате WAV
-        ".zip",  # Архив ZIP
-        ".rar",  # Архив RAR
-        ".tar",  # Архив TAR
-        ".gz",  # Архив GZIP
-        ".7z",  # Архив 7-Zip
-
-        ".jpg",  # Изображение в формате JPEG
-        ".jpeg",  # Изображение в формате JPEG
-        ".jpe",  # Изображение в формате JPEG
-        ".jif",  # Изображение в формате JPEG
-        ".jfif",  # Изображение в формате JPEG
-        ".jfi",  # Изображение в формате JPEG
-        ".png",  # Изображение в формате PNG
-        ".gif",  # Изображение в формате GIF
-        ".bmp",  # Изображение в формате BMP
-        ".dib",  # Изображение в формате BMP
-        ".tif",  # Изображение в формате TIFF
-        ".tiff",  # Изображение в формате TIFF
-        ".webp",  # Изображение в формате WebP
-        ".svg",  # Векторное изображение в формате SVG
-        ".svgz",  # Векторное изображение в формате SVG (сжатый)
-        ".ico",  # Иконка в формате ICO
-        ".jxr",  # Изображение в формате JPEG XR
-        ".wdp",  # Изображение в формате JPEG XR
-        ".hdp",  # Изображение в формате JPEG XR
-        ".jp2",  # Изображение в формате JPEG 2000
-        ".j2k",  # Изображение в формате JPEG 2000
-        ".jpf",  # Изображение в формате JPEG 2000
-        ".jpx",  # Изображение в формате JPEG 2000
-        ".jpm",  # Изображение в формате JPEG 2000
-        ".mj2",  # Изображение в формате JPEG 2000
-
-        ".otf",  # Открытый тип шрифта
-        ".ttf",  # TrueType шрифт
-        ".woff",  # Веб-шрифт формата WOFF (Web Open Font Format)
-        ".woff2",  # Веб-шрифт формата WOFF 2.0 (Web Open Font Format 2.0)
-        ".eot",  # Файл встраиваемого шрифта формата EOT (Embedded OpenType)
-        ".pfa",  # Компактный файл шрифта формата PFA (PostScript Font ASCII)
-        ".pfb",  # Компактный файл шрифта формата PFB (PostScript Font Binary)
-        ".otc",  # Компактный файл шрифта формата OTC (OpenType Compact Font)
-        ".ttc",  # Компактный файл шрифта формата TTC (TrueType Collection)
-        ".dfont",  # Файл шрифта Macintosh формата Dfont
-
-        # Добавьте другие расширения, если необходимо
-    ]
-
-    for file_path in traverse_repo_iteratively(repo_path, ignore_file):
-        extension = os.path.splitext(file_path)[1]  # Extract file extension
-        if extension in binary_extensions:
-            logging.debug("Пропуск бинарного файла: %s", file_path)
-        else:
-            # Проверяем, является ли файлом перед открытием
-            if os.path.isfile(os.path.join(repo_path, file_path)):
-                try:
-                    with open(os.path.join(repo_path, file_path), "r", encoding="utf-8") as f:
-                        file_content = f.read()
-                        yield file_path, file_content
-                except Exception as e:
-                    logging.warning("Ошибка при чтении файла '%s': %s", file_path, e)
+    for path, is_file in entries:
+        repo_paths.append(path)
+        if is_file:
+            yield path
 
 
-def analyze_repo(repo_path, ignore_file="ignore.txt"):
+def read_file_content(repo_path, file_path, debug_enabled=True):
     """
-    Анализирует клонированный репозиторий.
+    Считывает содержимое одного файла репозитория.
+
+    Файлы, в первых BINARY_PROBE_SIZE байтах которых встречается нулевой байт,
+    считаются бинарными и пропускаются без чтения остального содержимого.
+    Некорректные для UTF-8 байты заменяются символом U+FFFD, а не приводят к пропуску файла.
+    Файлы больше STREAM_THRESHOLD не считываются в память: вместо строки
+    возвращается открытый текстовый поток, который закрывает вызывающий код.
 
     Args:
         repo_path (str): Путь к папке репозитория.
-        ignore_file (str): Путь к файлу игнорирования (по умолчанию: "ignore.txt").
+        file_path (str): Относительный путь к файлу.
+        debug_enabled (bool): Записывать ли в журнал пропуск бинарных файлов (по умолчанию: True).
 
     Returns:
-        tuple: Кортеж, содержащий (имя_репозитория, инструкции, содержимое_readme, структура_репозитория, содержимое_файлов).
+        str | TextIO: Содержимое файла или открытый поток для большого файла,
+        либо None, если файл бинарный или его не удалось прочитать.
+    """
+    try:
+        # Небуферизованный файл: небольшой файл считывается одним readall() без промежуточных слоёв
+        f = open(os.path.join(repo_path, file_path), "rb", buffering=0)
+    except Exception as e:
+        logging.warning("Ошибка при чтении файла '%s': %s", file_path, e)
+        return None
+
+    try:
+        is_large = os.fstat(f.fileno()).st_size > STREAM_THRESHOLD
+        data = f.read(BINARY_PROBE_SIZE) if is_large else f.readall()
+        if data.find(b"\x00", 0, BINARY_PROBE_SIZE) != -1:
+            if debug_enabled:
+                logging.debug("Пропуск бинарного файла: %s", file_path)
+            f.close()
+            return None
+        if is_large:
+            f.seek(0)
+            return io.TextIOWrapper(io.BufferedReader(f, COPY_CHUNK_SIZE), encoding="utf-8", errors="replace")
+        f.close()
+        text = data.decode("utf-8", errors="replace")
+        if "\r" in text:
+            # Переводы строк приводятся к "\n", как при чтении в текстовом режиме
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        return text
+    except Exception as e:
+        f.close()
+        logging.warning("Ошибка при чтении файла '%s': %s", file_path, e)
+    return None
+
+
+def get_file_contents_iteratively(repo_path, file_paths):
+    """
+    Итеративно считывает содержимое файлов, пропуская бинарные файлы.
+
+    Файлы читаются параллельно в пуле потоков, но возвращаются в исходном порядке.
+
+    Args:
+        repo_path (str): Путь к папке репозитория.
+        file_paths (iterable): Относительные пути к файлам, полученные при обходе репозитория.
+
+    Yields:
+        tuple: Кортеж, содержащий (путь_к_файлу, содержимое_файла) для каждого небинарного файла.
+            Для больших файлов вместо строки возвращается открытый текстовый поток.
+    """
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+    # Ограничиваем число прочитанных, но ещё не записанных файлов в памяти
+    max_pending = max_workers * 2
+    # Уровень логирования проверяется один раз, а не для каждого пропущенного файла
+    debug_enabled = logging.getLogger().isEnabledFor(logging.DEBUG)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for file_path in file_paths:
+            _, dot, extension = file_path.rpartition(".")
+            if dot and os.sep not in extension and extension.lower() in BINARY_EXTENSIONS:
+                if debug_enabled:
+                    logging.debug("Пропуск бинарного файла: %s", file_path)
+                continue
+            pending.append((file_path, executor.submit(read_file_content, repo_path, file_path, debug_enabled)))
+            if len(pending) >= max_pending:
+                done_path, future = pending.popleft()
+                file_content = future.result()
+                if file_content is not None:
+                    yield done_path, file_content
+
+        while pending:
+            done_path, future = pending.popleft()
+            file_content = future.result()
+            if file_content is not None:
+                yield done_path, file_content
+
+
+def analyze_repo(repo_path, ignore_file, out):
+    """
+    Анализирует клонированный репозиторий и записывает результат в поток вывода.
+
+    Args:
+        repo_path (str): Путь к папке репозитория.
+        ignore_file (str): Путь к файлу игнорирования.
+        out (TextIO): Открытый текстовый файл, в который записывается результат.
     """
     repo_name = os.path.basename(repo_path)
 
     coloredlogs.install(level='INFO')
 
+    instructions = f"Prompt: Analyze the {repo_name} repository to understand its structure, purpose, and functionality. Follow these steps to study the codebase:\n\n"
+    out.write(instructions)
+
     logging.info("Получение README для: %s", repo_name)
     readme_content = get_readme_content(repo_path)
-
-    logging.info("\nПолучение структуры репозитория для: %s", repo_name)
-    repo_structure = f"Структура репозитория: {repo_name}\n"
-    for path in traverse_repo_iteratively(repo_path, ignore_file):
-        repo_structure += path + "\n"
+    out.write(f"README:\n{readme_content}\n\n")
 
     logging.info("\nПолучение содержимого файлов для: %s", repo_name)
-    file_contents = ""
-    for file_path, content in get_file_contents_iteratively(repo_path, ignore_file):
-        file_contents += f"Файл: {file_path}\nСодержимое:\n{content}\n\n"
-
-    instructions = f"Prompt: Analyze the {repo_name} repository to understand its structure, purpose, and functionality. Follow these steps to study the codebase:\n\n"
+    # Обход выполняется один раз и совмещается с чтением файлов;
+    # все пути запоминаются, чтобы затем записать структуру репозитория
+    repo_paths = []
+    ignored_paths, ignored_pattern = load_ignored_paths(ignore_file)
+    entries = traverse_repo_iteratively(repo_path, ignored_paths, ignored_pattern)
+    files = get_file_contents_iteratively(repo_path, iterate_file_paths(entries, repo_paths))
+    for file_path, content in tqdm(files, desc="Чтение файлов", unit=" файлов", leave=False):
+        out.write(f"Файл: {file_path}\nСодержимое:\n")
+        if isinstance(content, str):
+            out.write(content)
+        else:
+            # Большой файл копируется в вывод частями, не загружаясь в память целиком
+            with content:
+                try:
+                    shutil.copyfileobj(content, out, COPY_CHUNK_SIZE)
+                except Exception as e:
+                    logging.warning("Ошибка при чтении файла '%s': %s", file_path, e)
+        out.write("\n\n")
 
-    return repo_name, instructions, readme_content, repo_structure, file_contents
+    logging.info("\nЗапись структуры репозитория для: %s", repo_name)
+    out.write(f"Структура репозитория: {repo_name}\n")
+    for path in repo_paths:
+        out.write(path)
+        out.write("\n")
 
 
 if __name__ == "__main__":
@@ -209,14 +405,18 @@ if __name__ == "__main__":
             logging.error("Некорректный путь к репозиторию. Пожалуйста, введите правильный путь.")
 
     try:
-        repo_name, instructions, readme_content, repo_structure, file_contents = analyze_repo(repo_path, "ignore.txt")
+        repo_name = os.path.basename(repo_path)
         output_filename = f"{repo_name}_contents.txt"
-        with open(output_filename, "w", encoding="utf-8") as f:
-            f.write(instructions)
-            f.write(f"README:\n{readme_content}\n\n")
-            f.write(repo_structure)
-            f.write("\n\n")
-            f.write(file_contents)
+        # Отчёт пишется во временный файл и заменяет итоговый только после успешного анализа
+        temp_filename = output_filename + ".tmp"
+        try:
+            with open(temp_filename, "w", encoding="utf-8", buffering=OUTPUT_BUFFER_SIZE) as f:
+                analyze_repo(repo_path, "ignore.txt", f)
+        except BaseException:
+            if os.path.exists(temp_filename):
+                os.remove(temp_filename)
+            raise
+        os.replace(temp_filename, output_filename)
         logging.info("Содержимое репозитория сохранено в '%s'", output_filename)
 
         # Ожидание нажатия Enter перед закрытием